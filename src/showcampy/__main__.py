@@ -1,18 +1,20 @@
 from bs4 import BeautifulSoup, Tag
-from datetime import datetime
-from fake_useragent import UserAgent
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from mutagen.mp4 import MP4
 from pathlib import Path
+from requests.adapters import HTTPAdapter, Retry
 from rich.logging import RichHandler
-from typing import Type
-from urllib.parse import urlparse
+from typing import Any, Callable, Iterable, Iterator, Type, TypeVar
 import argparse
+import functools
+import itertools
 import logging
 import msgspec
+import msgspec.toml
 import platformdirs
 import re
 import requests
-import subprocess
 import sys
 import tomlkit
 
@@ -35,8 +37,24 @@ DEFAULT_ENCODING = 'utf-8'
 DEFAULT_SAVE_PATH = PLATFORMDIRS.user_downloads_path / 'showcamrips'
 DEFAULT_ARCHIVES_FOLDER = DEFAULT_SAVE_PATH / 'videos_archives'
 MAIN_URL = 'https://www.showcamrips.com/'
-UA_OBJ = UserAgent()
-UA = UA_OBJ.chrome
+MAX_WORKERS = 8
+DATETIME_PATTERN = re.compile(r'(\d{4}-?\d{2}-?\d{2})[-_]?(\d{4,6})$')
+VIDEO_ID_PATTERN = re.compile(r'^\d+')
+T = TypeVar('T')
+R = TypeVar('R')
+UA = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+
+def create_session() -> requests.Session:
+    session = requests.Session()
+    retries = Retry(total=3, backoff_factor=0.5)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=20, max_retries=retries)
+    session.mount('https://', adapter)
+    session.headers.update({'User-Agent': UA, 'Referer': MAIN_URL})
+    return session
+
+
+SESSION = create_session()
 
 
 class DefaultConfig(msgspec.Struct, kw_only=True):
@@ -64,6 +82,7 @@ def decode_hook(type_: Type[Path], value: Path | str) -> Path | str:
     return value
 
 
+@functools.lru_cache(maxsize=None)
 def get_config_path(path: Path | None = None) -> Path:
     if path is None:
         return DEFAULT_CONFIGURATION_PATH
@@ -77,10 +96,8 @@ def load_config(path: Path | None = None) -> DefaultConfig:
     with open(path, 'r', encoding=DEFAULT_ENCODING) as fp:
         data = fp.read()
 
-    config_dict = tomlkit.loads(data)
-
     try:
-        return msgspec.convert(config_dict, type=DefaultConfig, dec_hook=decode_hook)
+        return msgspec.toml.decode(data, type=DefaultConfig, dec_hook=decode_hook)
     except msgspec.DecodeError:
         return DefaultConfig()
 
@@ -107,37 +124,30 @@ def load_or_create_config(path: Path | None = None) -> DefaultConfig:
     return configuration
 
 
-CONFIG = load_or_create_config()
-DL_PATH = CONFIG.downloads_folder
-ARCHIVES_FOLDER = CONFIG.archives_folder
-
-
 def check_path(CONFIG: DefaultConfig) -> None:
     for key in CONFIG.__annotations__.keys():
         path = CONFIG.__getattribute__(key)
         path.mkdir(parents=True, exist_ok=True)
 
 
-check_path(CONFIG)
+def bootstrap() -> DefaultConfig:
+    config = load_or_create_config()
+    check_path(config)
+    return config
 
 
 def get_document(url: str) -> BeautifulSoup:
-    headers = {'User-Agent': UA, 'Referer': MAIN_URL}
-    r = requests.get(url, headers=headers)
-    r.raise_for_status()
-    return BeautifulSoup(r.content, "html.parser")
+    with SESSION.get(url, stream=True, timeout=15) as r:
+        r.raise_for_status()
+        r.raw.decode_content = True
+        return BeautifulSoup(r.raw, "lxml")
 
 
 def get_performer_pages(soup: BeautifulSoup) -> tuple[list[str], int]:
-    pages_elements = soup.find(class_='pages')
+    pages_elements = soup.select_one('.pages')
     
-    if isinstance(pages_elements, Tag):
-        pages = [
-            href
-            for a in pages_elements.find_all('a')
-            if isinstance(a, Tag)
-            and isinstance((href := a.get('href')), str)
-        ]
+    if pages_elements is not None:
+        pages = [str(a['href']) for a in pages_elements.select('a[href]')]
 
         return pages, len(pages)
 
@@ -145,44 +155,48 @@ def get_performer_pages(soup: BeautifulSoup) -> tuple[list[str], int]:
 
 
 def get_all_page_urls(soup: BeautifulSoup) -> list[str]:
-    return [
-        href
-        for ele in soup.find_all(class_='moiclick1')
-        if isinstance(ele, Tag) 
-        and isinstance((href := ele.get("href")), str)
-    ]
+    return [str(ele['href']) for ele in soup.select('.moiclick1[href]')]
 
 
 def get_last_url_segment(url: str) -> str:
-    parsed = urlparse(url)
-    return parsed.path.rstrip("/").split("/")[-1]
-
-
-def build_command(
-    url: str,
-    video_download_path: Path,
-) -> list[str | Path]:
-    return [
-        'yt-dlp', url,
-        '--no-warnings',
-        '--user-agent', f'{UA}',
-        '--add-header', f'Referer: {MAIN_URL}',
-        '--abort-on-unavailable-fragments',
-        '--ignore-config',
-        '-N', '2',
-        '--file-access-retries', '4',
-        '--retries', '100',
-        '--retry-sleep', '2',
-        '--user-agent', UA,
-        '-o', video_download_path
-    ]
-
-
-def read_archive(archive: Path) -> list[int]:
+    path = url.split('#', 1)[0].split('?', 1)[0]
+    return path.rstrip('/').rsplit('/', 1)[-1]
+
+
+def build_options(video_download_path: Path) -> dict[str, Any]:
+    return {
+        'no_warnings': True,
+        'http_headers': {'User-Agent': UA, 'Referer': MAIN_URL},
+        'skip_unavailable_fragments': False,
+        'concurrent_fragment_downloads': 2,
+        'file_access_retries': 4,
+        'retries': 100,
+        'fragment_retries': 10,
+        'extractor_retries': 3,
+        'retry_sleep_functions': {'http': lambda n: 2},
+        'outtmpl': str(video_download_path),
+    }
+
+
+def download_video(url: str, video_download_path: Path) -> bool:
+    from yt_dlp import YoutubeDL
+    from yt_dlp.utils import DownloadError
+
+    with YoutubeDL(build_options(video_download_path)) as ydl:
+        try:
+            ydl.download([url])
+        except DownloadError as e:
+            logging.error(f'Could not download {url}: {e}')
+            return False
+
+    return True
+
+
+def read_archive(archive: Path) -> set[int]:
     with open(archive, 'r') as file:
-        id_list = [int(line.split()[1]) for line in file if line.strip()]
+        id_set = {int(line.removeprefix('showcamrips')) for line in file if line.strip()}
 
-    return id_list
+    return id_set
 
 
 def save_txt(path_name: Path, text_string: str) -> None:
@@ -205,7 +219,7 @@ def get_source_website(soup: BeautifulSoup) -> str | None:
 
 
 def test_for_status(src: str) -> int:
-    test_request = requests.head(src)
+    test_request = SESSION.head(src, allow_redirects=True, timeout=10)
     return test_request.status_code
 
 def get_actual_video_link(src: str) -> str | None:
@@ -237,22 +251,20 @@ def get_play_video_link(soup: BeautifulSoup) -> str | None:
 
 
 def extract_datetime(s: str) -> str:
-    match = re.search(r'(\d{4}-?\d{2}-?\d{2})[-_]?(\d{4,6})$', s)
+    formatted_date = 'NA'
+    match = DATETIME_PATTERN.search(s)
 
     if match:
         date, time = match.groups()
         time = time.ljust(6, '0')
-        joined_date_string  = re.sub(r'-', '', date + time)
-        date = datetime.strptime(joined_date_string, "%Y%m%d%H%M%S")
-
-        if date:
-            formatted_date = date.strftime("%Y-%m-%d-%H-%M-%S")
+        digits = (date + time).replace('-', '')
+        formatted_date = f'{digits[:4]}-{digits[4:6]}-{digits[6:8]}-{digits[8:10]}-{digits[10:12]}-{digits[12:]}'
 
     return formatted_date
 
 
 def extract_video_id(s: str) -> int:
-    match = re.match(r'^\d+', s)
+    match = VIDEO_ID_PATTERN.match(s)
 
     if match:
         group = match.group()
@@ -260,12 +272,13 @@ def extract_video_id(s: str) -> int:
     return int(group)
 
 
-def get_video_filename(performer: str, link: str) -> tuple[int, str]:
-    last_segment = get_last_url_segment(link).rstrip('.html')
-    video_id = extract_video_id(last_segment)
-    formatted_date = extract_datetime(last_segment)
-    filename = f'{performer} - {formatted_date} - {video_id}.mp4'
-    return video_id, filename
+def get_video_segment(link: str) -> str:
+    return get_last_url_segment(link).removesuffix('.html')
+
+
+def get_video_filename(performer: str, video_segment: str, video_id: int) -> str:
+    formatted_date = extract_datetime(video_segment)
+    return f'{performer} - {formatted_date} - {video_id}.mp4'
 
 
 def embed_comment(video_path: Path, comment: str) -> None:
@@ -292,82 +305,141 @@ def get_performer_name(soup: BeautifulSoup) -> str:
     return performer
 
 
-def main() -> None:
-    parser = parse_showcampy()
-    args = parser.parse_args(sys.argv[1:])
+class VideoInfo(msgspec.Struct, kw_only=True):
+    link: str
+    source_website: str | None = None
+    play_video_link: str | None = None
+
+
+def fetch_video_info(link: str) -> VideoInfo:
+    video_soup = get_document(link)
+    return VideoInfo(
+        link=link,
+        source_website=get_source_website(video_soup),
+        play_video_link=get_play_video_link(video_soup),
+    )
+
+
+def map_ahead(
+    executor: ThreadPoolExecutor,
+    fn: Callable[[T], R],
+    items: Iterable[T],
+    window: int = MAX_WORKERS,
+) -> Iterator[R]:
+    items_iter = iter(items)
+    futures: deque[Future[R]] = deque(
+        executor.submit(fn, item) for item in itertools.islice(items_iter, window)
+    )
+
+    while futures:
+        future = futures.popleft()
+
+        for item in itertools.islice(items_iter, 1):
+            futures.append(executor.submit(fn, item))
+
+        yield future.result()
+
+
+def process_url(url: str, config: DefaultConfig, executor: ThreadPoolExecutor) -> None:
+    logging.info(f'Main URL: {url}')
+    base_soup = get_document(url)
+    performer = get_performer_name(base_soup)
+    all_links = []
+
+    if '/show-cam-sex-movies/' in url and url.endswith('.html'):
+        all_links.append(url)
+    else:
+        logging.info('Fetching performer info')
+        page_links, total_pages = get_performer_pages(base_soup)
+        total_pages = max(total_pages, 1)
+        logging.info(f'Fetching links from page 1 out of {total_pages}')
+        all_links.extend(get_all_page_urls(base_soup))
+        page_soups = executor.map(get_document, page_links[1:])
+
+        for idx, page_soup in enumerate(page_soups, start=2):
+            logging.info(f'Fetching links from page {idx} out of {total_pages}')
+            all_links.extend(get_all_page_urls(page_soup))
+
+    performer_archive_path  = config.archives_folder / f'{performer}.txt'
+    total_all_links = len(all_links)
+    touch_archive_path(performer_archive_path)
+    archive = read_archive(performer_archive_path)
+    pending = []
+    seen = set()
+
+    for idx, link in enumerate(all_links):
+        video_segment = get_video_segment(link)
+        video_id = extract_video_id(video_segment)
+
+        if video_id in archive:
+            logging.info(f'Video {idx+1} out of {total_all_links}: {video_id} already in archive')
+            continue
+
+        if video_id in seen:
+            logging.info(f'Video {idx+1} out of {total_all_links}: {video_id} already queued')
+            continue
+
+        seen.add(video_id)
+        video_filename = get_video_filename(performer, video_segment, video_id)
+        pending.append((idx, video_id, video_filename))
+
+    videos_info = map_ahead(executor, fetch_video_info, [all_links[idx] for idx, _, _ in pending])
+
+    with open(performer_archive_path, 'a', encoding=DEFAULT_ENCODING) as archive_fp:
+        for (idx, video_id, video_filename), video_info in zip(pending, videos_info):
+            logging.info(f'Video {idx+1} out of {total_all_links}: {video_filename}')
+
+            if not video_info.play_video_link:
+                logging.error(f'No play link found on: {video_info.link}')
+                continue
 
-    for url in args.url:
-        logging.info(f'Main URL: {url}')
-        base_soup = get_document(url)
-        performer = get_performer_name(base_soup)
-        all_links = []
+            logging.info(f'Fetching src from: {video_info.play_video_link}')
+            status_code = test_for_status(video_info.play_video_link)
 
-        if '/show-cam-sex-movies/' in url and url.endswith('.html'):
-            all_links.append(url)
-        else:
-            logging.info('Fetching performer info')
-            page_links, total_pages = get_performer_pages(base_soup)
+            if status_code != 200:
+                logging.error(f'Could not get video link: Status code: {status_code} for {video_info.play_video_link}')
+                continue
 
-            for idx, page_link in enumerate(page_links):
-                logging.info(f'Fetching links from page {idx+1} out of {total_pages}')
+            actual_video_link = get_actual_video_link(video_info.play_video_link)
 
-                if page_link == page_links[0]:
-                    page_soup = base_soup
+            if actual_video_link:
+
+                if video_info.source_website:
+                    sorted_download_path = config.downloads_folder / video_info.source_website / performer
                 else:
-                    page_soup = get_document(page_link)
+                    sorted_download_path = config.downloads_folder / performer
+                    logging.warning('Source website not found')
 
-                links = get_all_page_urls(page_soup)
-                all_links.extend(links)
+                video_download_path = sorted_download_path / video_filename
 
-        performer_archive_path  = ARCHIVES_FOLDER / f'{performer}.txt'
-        total_all_links = len(all_links)
-        touch_archive_path(performer_archive_path)
-        archive = read_archive(performer_archive_path)
+                if not download_video(actual_video_link, video_download_path):
+                    continue
+
+                if video_download_path.exists():
+                    logging.info('Embedding metadata')
+                    embed_comment(video_download_path, video_info.link)
+                    logging.info('Archiving')
+                    archive_fp.write(f'showcamrips {video_id}\n')
+                    archive_fp.flush()
+
+    logging.info('Finished downloading playlist')
+
+
+def main() -> None:
+    parser = parse_showcampy()
+    args = parser.parse_args(sys.argv[1:])
+
+    config = bootstrap()
+
+    executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+
+    try:
+        for url in args.url:
+            process_url(url, config, executor)
+    finally:
+        executor.shutdown(cancel_futures=True)
+        SESSION.close()
 
-        for idx, link in enumerate(all_links):
-            video_id, video_filename = get_video_filename(performer, link)
-            logging.info(f'Video {idx+1} out of {total_all_links}: {video_filename}')
-            
-
-            if video_id not in archive:
-                video_soup = get_document(link)
-                source_website = get_source_website(video_soup)
-                logging.info(f'Fetching play link from: {link}')
-                play_video_link = get_play_video_link(video_soup)
-                logging.info(f'Fetching src from: {play_video_link}')
-
-                if play_video_link:            
-                    status_code = test_for_status(play_video_link)
-
-                    if status_code != 200:
-                        logging.error(f'Could not get video link: Status code: {status_code} for {play_video_link}')
-                        continue
-      
-                actual_video_link = get_actual_video_link(play_video_link)
-
-                if actual_video_link:            
-
-                    if source_website:
-                            sorted_download_path = DL_PATH / source_website / performer
-                    else:
-                        sorted_download_path = DL_PATH / performer
-                        logging.warning('Source website not found')
-
-                    video_download_path = sorted_download_path / video_filename
-
-                    if isinstance(actual_video_link, str):
-                        command = build_command(actual_video_link, video_download_path)
-                        subprocess.run(command)
-
-                        if video_download_path.exists():
-                            logging.info('Embedding metadata')
-                            embed_comment(video_download_path, link)
-                            logging.info('Archiving')
-                            save_txt(performer_archive_path, f'showcamrips {video_id}\n')
-            else:
-                logging.info(f'Video already in archive')
-
-        logging.info('Finished downloading playlist')
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,7 @@
+from pathlib import Path
+from showcampy.__main__ import build_options
+
+
+def test_retry_sleep_accepts_keyword_argument() -> None:
+    options = build_options(Path('video.mp4'))
+    assert options['retry_sleep_functions']['http'](n=0) == 2